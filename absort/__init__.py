@@ -7,11 +7,13 @@ from .__main__ import (
     absort_file,
     absort_files,
     absort_str,
+    run,
 )
 from .__version__ import __version__
 
 
 __all__ = [
+    "run",
     "absort_str",
     "absort_file",
     "absort_files",
@@ -4,37 +4,34 @@ from __future__ import annotations
 
 import asyncio
 import contextlib
+import hashlib
+import json
+import os
 import re
 import shutil
 import sys
 from collections import Counter
-from collections.abc import Iterable, Iterator
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import BrokenExecutor
 from datetime import datetime
 from enum import Enum, IntEnum, auto
+from functools import partial
+from itertools import islice
 from pathlib import Path
-from types import SimpleNamespace
-from typing import Any
+from typing import Any, TypeVar
 
-import cchardet
 import click
-from colorama import colorama_text
-from more_itertools import take
 from recipes.misc import bright_green, bright_yellow, profile
 
+from . import cache
 from .__version__ import __version__
-from .collections_extra import PriorityQueue
-from .core import (
-    CommentStrategy,
-    FormatOption,
-    NameRedefinition,
-    SortOrder,
-    absort_str,
-)
+from .core import FormatOption, NameRedefinition, SortOrder, absort_str
 from .typing_extra import PyVersion
 from .utils import colorized_unified_diff, no_color_context, silent_context
 
 
 __all__ = [
+    "run",
     "absort_str",
     "absort_file",
     "absort_files",
@@ -52,6 +49,14 @@ __all__ = [
 #
 
 
+class CommentStrategy(Enum):
+    """An enumeration to specify different kinds of comment strategies"""
+
+    PUSH_TOP = "push-top"
+    ATTR_FOLLOW_DECL = "attr-follow-decl"
+    IGNORE = "ignore"
+
+
 class FileAction(Enum):
     """An enumeration to specify different kinds of file actions"""
 
@@ -92,15 +97,35 @@ CACHE_DIR = Path.home() / ".absort_cache"
 # Specify the maximum size threshold for the cache directory (in bytes)
 CACHE_MAX_SIZE = 400000  # unit is byte
 CACHE_DIR_LOCK = asyncio.Lock()
+# Specify the filename suffix of the backup files in the cache directory. The full
+# filename pattern is `<filename>.<14-digit timestamp>.backup`.
+BACKUP_FILENAME_SUFFIX = ".backup"
+# Specify the location of the index of files known to be already sorted
+SORTED_INDEX_FILE = CACHE_DIR / "sorted_index" / "sorted_index.json"
+# Specify the maximum number of entries of the index of files known to be already sorted
+SORTED_INDEX_MAX_ENTRIES = 10000
+# Specify the location of the persistent cache of sorting results
+SORT_CACHE_DIR = CACHE_DIR / "sorted"
+# Specify the maximum size threshold for the cache of sorting results (in bytes)
+SORT_CACHE_MAX_SIZE = 20000000  # unit is byte
 
 #
 # Type Annotations
 #
 
+# Map absolute file path to [st_mtime_ns, st_size], in the order of insertion
+SortedIndex = dict[str, list[int]]
+
+T = TypeVar("T")
+
 #
 # Global Variables
 #
 
+# The total size of the files in the cache directory (in bytes), tracked incrementally.
+# None means that the cache directory has not been set up in this run yet.
+_cache_size: int | None = None
+
 #
 # Custom Exceptions
 #
@@ -119,6 +144,55 @@ class MutuallyExclusiveOptions(Exception):
 #
 
 
+class ProcessPool:
+    """
+    A process pool that survives the abrupt death of its worker processes
+
+    When a worker process dies abruptly, e.g. killed by the OOM killer, or crashed by
+    a C stack overflow in the parser, the whole process pool breaks, and all the jobs
+    in it fail alike. The pool is then replaced by a new one for the subsequent jobs,
+    and each of the failed jobs is retried in an isolated process, to tell the culprit
+    apart.
+    """
+
+    __slots__ = ("_executor_class", "_executor")
+
+    def __init__(self) -> None:
+        # Lazy import, it drags in the multiprocessing machinery, which is not needed
+        # for a single file, nor for invocations like `--help` and `--version`.
+        from concurrent.futures import ProcessPoolExecutor
+
+        self._executor_class = ProcessPoolExecutor
+        self._executor = ProcessPoolExecutor()
+
+    def __enter__(self) -> ProcessPool:
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self._executor.shutdown()
+
+    async def run(self, job: Callable[[], T]) -> T:
+        """Run the job in the pool. Raise BrokenExecutor if it crashes the process."""
+
+        loop = asyncio.get_running_loop()
+
+        executor = self._executor
+        try:
+            # Exceptions raised in the worker process are pickled and re-raised here
+            return await loop.run_in_executor(executor, job)
+        except BrokenExecutor:
+            # Other failed jobs may have replaced the broken pool already
+            if self._executor is executor:
+                executor.shutdown(wait=False)
+                self._executor = self._executor_class()
+
+        isolated_executor = self._executor_class(max_workers=1)
+        try:
+            return await loop.run_in_executor(isolated_executor, job)
+        finally:
+            isolated_executor.shutdown(wait=False)
+
+
 class CommentStrategyParamType(click.ParamType):
     """A parameter type for the --comment-strategy CLI option"""
 
@@ -142,33 +216,31 @@ class PyVersionParamType(click.ParamType):
 
     name = "py_version"
 
-    def convert(self, value: str, param: Any, ctx: Any) -> PyVersion:
+    # Reference: "Currently major must equal to 3." from https://docs.python.org/3/library/ast.html#ast.parse
+    # Reference: "The lowest supported version is (3, 4); the highest is sys.version_info[0:2]." from https://docs.python.org/3/library/ast.html#ast.parse
+    valid_py_versions = frozenset((3, y) for y in range(4, sys.version_info[1] + 1))
+
+    py_version_pattern = re.compile(r"(?P<major>\d+)\.(?P<minor>\d+)")
+
+    invalid_value_message = (
+        "--py argument has invalid value. Possible values are "
+        + ", ".join(f"{x}.{y}" for x, y in sorted(valid_py_versions))
+        + "."
+    )
 
-        # Reference: "Currently major must equal to 3." from https://docs.python.org/3/library/ast.html#ast.parse
-        valid_majors = [3]
-        # Reference: "The lowest supported version is (3, 4); the highest is sys.version_info[0:2]." from https://docs.python.org/3/library/ast.html#ast.parse
-        valid_minors = range(4, sys.version_info[1] + 1)
-        valid_py_versions = [(x, y) for x in valid_majors for y in valid_minors]
+    def convert(self, value: str, param: Any, ctx: Any) -> PyVersion:
 
         try:
-            m = re.fullmatch(r"(?P<major>\d+)\.(?P<minor>\d+)", value)
+            m = self.py_version_pattern.fullmatch(value)
             if not m:
                 raise ValueError
             version = int(m.group("major")), int(m.group("minor"))
-            if version not in valid_py_versions:
+            if version not in self.valid_py_versions:
                 raise ValueError
             return version
 
         except ValueError:
-            stringfy_valid_py_versions = ", ".join(
-                f"{x}.{y}" for x, y in valid_py_versions
-            )
-            self.fail(
-                "--py argument has invalid value. "
-                f"Possible values are {stringfy_valid_py_versions}.",
-                param,
-                ctx,
-            )
+            self.fail(self.invalid_value_message, param, ctx)
 
 
 class BypassPromptParamType(click.ParamType):
@@ -185,9 +257,6 @@ class BypassPromptParamType(click.ParamType):
             self.fail("--yes flag has invalid count.", param, ctx)
 
 
-# TODO provide a programmatical interface. Check if click library provides such a functionality, to turn a CLI interface to programmatical interface.
-
-
 # TODO add -V as short option of --version
 @click.command(
     name="absort",
@@ -330,8 +399,7 @@ def main(
 ) -> None:
     """A command line utility to sort Python source code by abstraction levels"""
 
-    options = SimpleNamespace(**ctx.params)
-    validate_args(options)
+    validate_args(ctx.params)
 
     if not no_aggressive:
         # Optionally use uvloop to boost speed
@@ -360,17 +428,65 @@ def main(
         if not ans:
             bypass_prompt = BypassPromptLevel.NO
 
+    run(
+        filepaths,
+        check=check,
+        display_diff=display_diff,
+        in_place=in_place,
+        no_fix_main_to_bottom=no_fix_main_to_bottom,
+        reverse=reverse,
+        no_aggressive=no_aggressive,
+        encoding=encoding,
+        comment_strategy=comment_strategy,
+        py_version=py_version,
+        quiet=quiet,
+        verbose=verbose,
+        color_off=color_off,
+        bypass_prompt=bypass_prompt,
+        dfs=dfs,
+        bfs=bfs,
+        separate_class_and_function=separate_class_and_function,
+    )
+
+
+def run(
+    filepaths: Iterable[str],
+    *,
+    check: bool = False,
+    display_diff: bool = False,
+    in_place: bool = False,
+    no_fix_main_to_bottom: bool = False,
+    reverse: bool = False,
+    no_aggressive: bool = False,
+    encoding: str = "utf-8",
+    comment_strategy: CommentStrategy = CommentStrategy.ATTR_FOLLOW_DECL,
+    py_version: PyVersion = (3, 10),
+    quiet: bool = False,
+    verbose: bool = False,
+    color_off: bool = False,
+    bypass_prompt: BypassPromptLevel = BypassPromptLevel.NO,
+    dfs: bool = False,
+    bfs: bool = False,
+    separate_class_and_function: bool = False,
+) -> Counter[FileResult]:
+    """
+    Sort the Python files searched from the given paths, as the command line utility does.
+
+    This is the programmatic interface of the command line utility. It bypasses the click
+    machinery, so the arguments are expected to be already validated.
+    """
+
     files = list(collect_python_files(filepaths))
     if not files:
         print("No file is found")
-        return
+        return Counter()
     print(f"Found {len(files)} files")
 
+    # TODO core doesn't support separating classes and functions yet
     format_option = FormatOption(
-        no_aggressive=no_aggressive,
         reverse=reverse,
-        no_fix_main_to_bottom=no_fix_main_to_bottom,
-        separate_class_and_function=separate_class_and_function,
+        pin_main=not no_fix_main_to_bottom,
+        aggressive=not no_aggressive,
     )
 
     if display_diff:
@@ -392,7 +508,13 @@ def main(
     verboseness_context_manager = silent_context() if quiet else contextlib.nullcontext()
 
     # TODO test --color-off under different environments, eg. Linux, macOS, ...
-    colorness_context_manager = no_color_context() if color_off else colorama_text()
+    if color_off:
+        colorness_context_manager = no_color_context()
+    else:
+        # Lazy import, colorama is only needed when color output is actually emitted
+        from colorama import colorama_text
+
+        colorness_context_manager = colorama_text()
 
     with verboseness_context_manager, colorness_context_manager:
 
@@ -410,36 +532,47 @@ def main(
 
         display_summary(digest)
 
+    return digest
+
 
-def validate_args(options: SimpleNamespace) -> None:
+def validate_args(options: dict[str, Any]) -> None:
     """Preliminary check of the validness of the CLI argument"""
 
     # FIXME use click library's builtin mechanism to specify mutually exclusive options
 
-    if sum([options.check, options.display_diff, options.in_place]) > 1:
+    if options["check"] + options["display_diff"] + options["in_place"] > 1:
         raise MutuallyExclusiveOptions(
             "Only one of the `--check`, `--diff` and `--in-place` options can be specified at the same time"
         )
 
-    if options.quiet and options.verbose:
+    if options["quiet"] and options["verbose"]:
         raise MutuallyExclusiveOptions(
             "Can't specify both `--quiet` and `--verbose` options"
         )
 
-    if options.dfs and options.bfs:
+    if options["dfs"] and options["bfs"]:
         raise MutuallyExclusiveOptions("Can't specify both `--dfs` and `--bfs` options")
 
-    if options.in_place and options.quiet:
+    if options["in_place"] and options["quiet"]:
         # Because in-place updating files requires user confirmation through command line prompts.
         raise MutuallyExclusiveOptions(
             "Can't specify both `--in-place` and `--quiet` options"
         )
 
 
-# TODO use multi-thread to accelerate
 def collect_python_files(filepaths: Iterable[str]) -> Iterator[str]:
     """Yield python files searched from the given paths"""
 
+    def walk(directory: str) -> Iterator[str]:
+        # os.scandir() retrieves the file type along with the directory entry, so
+        # unlike Path.rglob(), no extra stat syscall is spent on each entry.
+        with os.scandir(directory) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    yield from walk(entry.path)
+                elif entry.name.endswith(".py") and entry.is_file():
+                    yield entry.path
+
     for filepath in filepaths:
         filepath = Path(filepath)
 
@@ -455,8 +588,7 @@ def collect_python_files(filepaths: Iterable[str]) -> Iterator[str]:
             yield str(filepath)
 
         elif filepath.is_dir():
-            for fp in filepath.rglob("*.py"):
-                yield str(fp)
+            yield from walk(str(filepath))
 
         else:
             raise NotImplementedError
@@ -475,27 +607,83 @@ def absort_files(
 ) -> Counter[FileResult]:
     """Sort a list of files"""
 
-    # TODO use multi-processing to boost speed of handling a bunch of files (CPU-bound parts)
-
-    async def entry() -> Counter[FileResult]:
-        tasks = (
-            absort_file(
-                file,
-                encoding,
-                bypass_prompt,
-                verbose,
-                file_action,
-                py_version,
-                comment_strategy,
-                format_option,
-                sort_order,
-            )
-            for file in files
-        )
-        results = await asyncio.gather(*tasks)
-        return Counter(results)
+    # The CPU-bound sorting of sources is dispatched to a process pool, so that a bunch
+    # of files are sorted on multiple cores in parallel, while the IO-bound parts stay
+    # in the event loop. For a single file, spawning worker processes doesn't pay off.
+
+    fingerprint = repr(
+        (__version__, py_version, comment_strategy, format_option, sort_order)
+    )
+
+    # The size of the cache directory is tracked anew in each run, as other absort
+    # processes may have added or evicted backups in the meantime
+    global _cache_size
+    _cache_size = None
+
+    # Files that are known to be already sorted, and are untouched since then, are
+    # skipped without being read or parsed. The PRINT action needs the source anyway.
+    # For a single file, loading and saving the whole index doesn't pay off.
+    if file_action is FileAction.PRINT or len(files) <= 1:
+        sorted_index = None
+    else:
+        sorted_index = load_sorted_index(fingerprint)
+        original_sorted_index = dict(sorted_index)
+
+    # The sizes of the entries stored to the sort cache in this run
+    sort_cache_stored_sizes: list[int] = []
+
+    async def entry(process_pool: ProcessPool | None) -> Counter[FileResult]:
+        digest: Counter[FileResult] = Counter()
+        pending_files = iter(files)
+        sorted_sources: dict[bytes, asyncio.Future[str | None]] = {}
+
+        async def worker() -> None:
+            # The workers share the iterator of pending files. The event loop is single
+            # threaded, so no file is ever pulled by two workers.
+            for file in pending_files:
+                result = await absort_file(
+                    file,
+                    encoding,
+                    bypass_prompt,
+                    verbose,
+                    file_action,
+                    py_version,
+                    comment_strategy,
+                    format_option,
+                    sort_order,
+                    process_pool,
+                    sorted_index,
+                    fingerprint,
+                    sorted_sources,
+                    SORT_CACHE_DIR,
+                    sort_cache_stored_sizes,
+                )
+                digest[result] += 1
+
+        # A fixed number of workers pipelines the files: while some workers wait for
+        # their sources to be sorted in the process pool, others are reading the next
+        # files from disk. Unlike spawning a task per file, the number of sources held
+        # in memory at a time is bounded.
+        num_workers = min(len(files), 2 * (os.cpu_count() or 1))
+        await asyncio.gather(*(worker() for _ in range(num_workers)))
+        return digest
+
+    process_pool_context: contextlib.AbstractContextManager[ProcessPool | None]
+    if len(files) > 1:
+        process_pool_context = ProcessPool()
+    else:
+        process_pool_context = contextlib.nullcontext()
+
+    with process_pool_context as process_pool:
+        digest = asyncio.run(entry(process_pool))
+
+    if sorted_index is not None and sorted_index != original_sorted_index:
+        save_sorted_index(sorted_index, fingerprint)
 
-    return asyncio.run(entry())
+    if sort_cache_stored_sizes:
+        cache.shrink(SORT_CACHE_DIR, SORT_CACHE_MAX_SIZE, sum(sort_cache_stored_sizes))
+
+    return digest
 
 
 @profile
@@ -509,34 +697,116 @@ async def absort_file(
     comment_strategy: CommentStrategy = CommentStrategy.ATTR_FOLLOW_DECL,
     format_option: FormatOption = FormatOption(),
     sort_order: SortOrder = SortOrder.TOPOLOGICAL,
+    process_pool: ProcessPool | None = None,
+    sorted_index: SortedIndex | None = None,
+    fingerprint: str = "",
+    sorted_sources: dict[bytes, asyncio.Future[str | None]] | None = None,
+    sort_cache_dir: Path | None = None,
+    sort_cache_stored_sizes: list[int] | None = None,
 ) -> FileResult:
-    """Sort the source in the given file"""
+    """
+    Sort the source in the given file
+
+    If a process pool is given, the CPU-bound sorting is run in it. Otherwise it's run
+    in-place, blocking the event loop.
+
+    If a sorted index is given, the file is skipped when the index records it as already
+    sorted, and it's untouched since then. The index is updated in-place. It's expected
+    to be recorded with the same options, as denoted by the fingerprint.
+
+    If a dict of sorted sources is given, the sorting in flight is shared with other
+    files of identical contents, keyed by the SHA-256 digest of the source.
+
+    If a sort cache directory is given, the sorting result is looked up from, and stored
+    to, the persistent cache there, keyed by the source digest and the fingerprint. If a
+    list of stored sizes is also given, the size of the stored entry is appended to it.
+    """
 
     async def read_source(filepath: Path) -> str:
         """Read source from the file, including exception handling"""
 
+        def decode(encoding: str) -> str:
+            # Translate universal newlines, as is done by Path.read_text()
+            return binary.decode(encoding).replace("\r\n", "\n").replace("\r", "\n")
+
+        # Read the file only once, even if it turns out to need a second decoding attempt
+        binary = await asyncio.to_thread(filepath.read_bytes)
+
         try:
-            return await asyncio.to_thread(filepath.read_text, encoding)
+            return decode(encoding)
         except UnicodeDecodeError:
             print(f"{filepath} is not decodable by {encoding}", file=sys.stderr)
             print(f"Try to automatically detect file encoding......", file=sys.stderr)
-            binary = await asyncio.to_thread(filepath.read_bytes)
+
+            # Lazy import, cchardet is a C extension only needed on this rare path
+            import cchardet
+
             detected_encoding = cchardet.detect(binary)["encoding"]
 
             try:
-                return await asyncio.to_thread(filepath.read_text, detected_encoding)
-            except UnicodeDecodeError:
+                return decode(detected_encoding)
+            except (UnicodeDecodeError, TypeError, LookupError):
 
                 print(f"{filepath} has unknown encoding.", file=sys.stderr)
                 raise ABSortFail
 
-    def absort_source(old_source: str) -> str:
+    async def absort_source(old_source: str) -> str:
         """Sort the source in string, including exception handling"""
 
-        try:
-            return absort_str(
-                old_source, py_version, comment_strategy, format_option, sort_order
+        job = partial(
+            absort_str_if_changed,
+            old_source,
+            py_version,
+            format_option,
+            sort_order,
+        )
+
+        source_digest = hashlib.sha256(old_source.encode()).digest()
+
+        async def sort() -> str | None:
+            if process_pool is None:
+                return job()
+            try:
+                return await process_pool.run(job)
+            except BrokenExecutor:
+                # Don't retry in-process, which would take down the whole run
+                print(f"{filepath} crashes the sorting process", file=sys.stderr)
+                raise ABSortFail
+
+        async def sort_with_cache() -> str | None:
+            if sort_cache_dir is None:
+                return await sort()
+
+            key = cache.cache_key(source_digest, fingerprint)
+            cached = await asyncio.to_thread(cache.load, sort_cache_dir, key)
+            if cached is not None:
+                return cached or None
+
+            new_source = await sort()
+            stored_size = await asyncio.to_thread(
+                cache.store, sort_cache_dir, key, new_source
             )
+            if stored_size and sort_cache_stored_sizes is not None:
+                sort_cache_stored_sizes.append(stored_size)
+            return new_source
+
+        try:
+            if sorted_sources is None:
+                new_source = await sort_with_cache()
+            else:
+                # Sources of identical contents in flight at the same time are sorted
+                # only once, by awaiting the same future. The future is forgotten once
+                # done, so that the sorted sources are not retained for the whole run.
+                # Later duplicates are served by the persistent cache instead.
+                future = sorted_sources.get(source_digest)
+                if future is None:
+                    future = asyncio.ensure_future(sort_with_cache())
+                    sorted_sources[source_digest] = future
+                    future.add_done_callback(
+                        lambda _: sorted_sources.pop(source_digest, None)
+                    )
+                new_source = await future
+            return old_source if new_source is None else new_source
         except SyntaxError as exc:
             # if re.fullmatch(r"Missing parentheses in call to 'print'. Did you mean print(.*)\?", exc.msg):
             #     pass
@@ -563,7 +833,11 @@ async def absort_file(
         async with CACHE_DIR_LOCK:
             await backup_to_cache(filepath)
 
-        await asyncio.to_thread(filepath.write_text, new_source, encoding)
+        # Encode in one shot and write the bytes, bypassing the text IO layer. As is done
+        # by Path.write_text(), newlines are translated to the platform's convention.
+        if os.linesep != "\n":
+            new_source = new_source.replace("\n", os.linesep)
+        await asyncio.to_thread(filepath.write_bytes, new_source.encode(encoding))
         if verbose:
             print(bright_green(f"Processed {filepath}"))
         return FileResult.MODIFIED
@@ -573,31 +847,34 @@ async def absort_file(
 
         # TODO add more styled output (e.g. colorized)
 
+        # An unchanged source is the same object as the old source, so the comparison
+        # is usually settled by identity.
+        changed = new_source != old_source
+
         if file_action is FileAction.DIFF:
 
-            display_diff_with_filename(old_source, new_source, str(filepath))
+            if changed:
+                display_diff_with_filename(old_source, new_source, str(filepath))
             return FileResult.UNMODIFIED
 
         elif file_action is FileAction.WRITE:
 
-            if old_source == new_source:
+            if not changed:
                 return FileResult.UNMODIFIED
             return await write_source(filepath, new_source)
 
         elif file_action is FileAction.CHECK:
 
-            if old_source != new_source:
+            if changed:
                 print(f"{filepath} needs reformat")
             return FileResult.UNMODIFIED
 
         elif file_action is FileAction.PRINT:
+            # Emit the output of the file in a single write, instead of a print() per part
             divider = bright_yellow("-" * 79)
-            print(divider)
-            print(filepath)
-            print(divider)
-            print(new_source)
-            print(divider)
-            print("\n", end="")
+            sys.stdout.write(
+                f"{divider}\n{filepath}\n{divider}\n{new_source}\n{divider}\n\n"
+            )
 
             return FileResult.UNMODIFIED
 
@@ -607,25 +884,72 @@ async def absort_file(
     try:
 
         filepath = Path(file)
+
+        if sorted_index is not None:
+            # Stat before reading, so that a modification in between invalidates the
+            # index entry
+            stat = await asyncio.to_thread(os.stat, file)
+            abspath = os.path.abspath(file)
+            index_entry = [stat.st_mtime_ns, stat.st_size]
+            if sorted_index.get(abspath) == index_entry:
+                return FileResult.UNMODIFIED
+
         old_source = await read_source(filepath)
-        new_source = absort_source(old_source)
+        new_source = await absort_source(old_source)
+
+        if sorted_index is not None:
+            if new_source == old_source:
+                sorted_index[abspath] = index_entry
+            else:
+                # The entry, if any, is stale
+                sorted_index.pop(abspath, None)
+
         return await process_new_source(new_source, filepath)
 
     except ABSortFail:
         return FileResult.FAILED
 
 
+def absort_str_if_changed(
+    old_source: str,
+    py_version: PyVersion,
+    format_option: FormatOption,
+    sort_order: SortOrder,
+) -> str | None:
+    """
+    Same as absort_str(), except that None is returned if the source is left unchanged.
+
+    When run in a worker process, it saves the cost to send back a copy of the source.
+    """
+
+    new_source = absort_str(old_source, py_version, format_option, sort_order)
+    return None if new_source == old_source else new_source
+
+
 async def backup_to_cache(file: Path) -> None:
     """Make a backup of the file, put in the cache"""
 
-    def generate_timestamp() -> str:
-        now = str(datetime.now())
-        digits = (char for char in now if char.isdigit())
-        return "".join(take(14, digits))
-
-    timestamp = generate_timestamp()
+    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
     backup_file = CACHE_DIR / (file.name + "." + timestamp + ".backup")
 
+    # The setup of the cache directory, and the walk to calculate its size, only need to
+    # be done once per run. Callers hold the CACHE_DIR_LOCK, so there is no race on the
+    # global variable.
+    global _cache_size
+    if _cache_size is None:
+        await init_cache_dir()
+        _cache_size = calculate_cache_size()
+
+    shutil.copy2(file, backup_file)
+    _cache_size += backup_file.stat().st_size
+
+    if _cache_size > CACHE_MAX_SIZE:
+        _cache_size = await shrink_cache(_cache_size, keep=backup_file)
+
+
+async def init_cache_dir() -> None:
+    """Create the cache directory, along with a README to explain its purpose"""
+
     CACHE_DIR.mkdir(parents=True, exist_ok=True)
     readme = CACHE_DIR / "README"
     if not readme.exists():
@@ -636,37 +960,107 @@ async def backup_to_cache(file: Path) -> None:
             encoding="utf-8",
         )
 
-    shutil.copy2(file, backup_file)
 
-    if CACHE_DIR.stat().st_size > CACHE_MAX_SIZE:
-        await shrink_cache()
+def calculate_cache_size() -> int:
+    """Calculate the total size of the backup files in the cache directory"""
+
+    # Only the backups are accounted. The other files in the cache directory, e.g. the
+    # README, are not subject to eviction, and the caches of sorting results are bounded
+    # on their own.
+    with os.scandir(CACHE_DIR) as it:
+        return sum(
+            entry.stat().st_size
+            for entry in it
+            if entry.is_file() and parse_backup_timestamp(entry.name)
+        )
 
 
-async def shrink_cache() -> None:
-    """Shrink the size of cache to under threshold"""
+async def shrink_cache(cache_size: int, keep: Path) -> int:
+    """
+    Shrink the size of cache to under threshold, and return the new size of cache
 
-    shrink_target_size = CACHE_MAX_SIZE - CACHE_DIR.stat().st_size
+    The backup file `keep`, i.e. the one just made, is never evicted.
+    """
 
-    backup_filename_pattern = r".*\.(?P<timestamp>\d{14})\.backup"
+    backups = sorted(
+        (timestamp, file)
+        for file in CACHE_DIR.iterdir()
+        if (timestamp := parse_backup_timestamp(file.name)) and file != keep
+    )
 
-    total_size = 0
-    pq = PriorityQueue(reverse=True)  # type: PriorityQueue[Path]
+    stats = await asyncio.gather(*(asyncio.to_thread(file.stat) for _, file in backups))
 
-    for file in CACHE_DIR.iterdir():
-        m = re.fullmatch(backup_filename_pattern, file.name)
-        if not m:
-            continue
+    # Evict the oldest backups first
+    evicted_files = []
+    for (_, file), stat in zip(backups, stats):
+        if cache_size <= CACHE_MAX_SIZE:
+            break
+        cache_size -= stat.st_size
+        evicted_files.append(file)
 
-        timestamp = m.group("timestamp")
-        pq.push(file, priority=timestamp)
+    await asyncio.gather(*(asyncio.to_thread(file.unlink) for file in evicted_files))
 
-        total_size += file.stat().st_size
+    return cache_size
 
-        while pq and total_size - pq.top().stat().st_size >= shrink_target_size:
-            total_size -= pq.top().stat().st_size
 
-    for file in pq.to_iterator():
-        file.unlink()
+def parse_backup_timestamp(filename: str) -> str | None:
+    """Return the timestamp of the backup file, or None if it's not a backup file"""
+
+    # Plain string operations, instead of matching a regex against every file
+    if not filename.endswith(BACKUP_FILENAME_SUFFIX) or len(filename) < 22:
+        return None
+
+    timestamp = filename[-21:-7]
+    if filename[-22] != "." or not timestamp.isdecimal():
+        return None
+
+    return timestamp
+
+
+def load_sorted_index(fingerprint: str) -> SortedIndex:
+    """
+    Load the index of files known to be already sorted from the cache directory
+
+    The index is recorded along with the fingerprint of the options that the files are
+    sorted with. An index recorded with other options is discarded.
+    """
+
+    try:
+        with SORTED_INDEX_FILE.open(encoding="utf-8") as f:
+            data = json.load(f)
+        if data["fingerprint"] != fingerprint:
+            return {}
+        return data["files"]
+    except (OSError, ValueError, TypeError, KeyError):
+        # A missing or corrupted index is as good as an empty one
+        return {}
+
+
+def save_sorted_index(sorted_index: SortedIndex, fingerprint: str) -> None:
+    """Save the index of files known to be already sorted to the cache directory"""
+
+    # Prune the least recently recorded entries, so that entries of files that are
+    # modified or deleted since then don't accumulate indefinitely.
+    num_stale_entries = len(sorted_index) - SORTED_INDEX_MAX_ENTRIES
+    if num_stale_entries > 0:
+        sorted_index = dict(islice(sorted_index.items(), num_stale_entries, None))
+
+    data = {"fingerprint": fingerprint, "files": sorted_index}
+
+    # Write to a temporary file and then atomically replace, so that concurrent runs
+    # never observe a half-written index.
+    tmp_file = SORTED_INDEX_FILE.with_name(f"{SORTED_INDEX_FILE.name}.{os.getpid()}")
+
+    # The index is merely an optimization. Failing to save it, e.g. because the cache
+    # directory is not writable, shouldn't fail the run.
+    try:
+        SORTED_INDEX_FILE.parent.mkdir(parents=True, exist_ok=True)
+        with tmp_file.open("w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_file, SORTED_INDEX_FILE)
+    except OSError:
+        with contextlib.suppress(OSError):
+            tmp_file.unlink()
 
 
 def display_diff_with_filename(
@@ -684,8 +1078,11 @@ def display_diff_with_filename(
         old_src_lines, new_src_lines, fromfile, tofile
     )
 
-    print(*diff_view_lines, sep="", end="")
-    print("\n", end="")
+    # Stream the diff view line by line, instead of materializing it as a whole
+    write = sys.stdout.write
+    for line in diff_view_lines:
+        write(line)
+    write("\n")
 
 
 def display_summary(digest: Counter[FileResult]) -> None:
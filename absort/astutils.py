@@ -8,11 +8,11 @@ from typing import Literal, TypeAlias
 
 from .treedist import pqgram, zhangshasha
 from .utils import (
+    cached_line_offsets,
     cached_splitlines,
     constantfunc,
     hamming_distance,
     iequal,
-    ireverse,
     is_blank_line,
     is_comment_line,
 )
@@ -95,17 +95,33 @@ def ast_get_leading_comment_and_decorator_list_source_lines(
 ) -> list[str]:
     # WARNING: ast.AST.lineno and ast.AST.end_lineno are 1-indexed
 
+    source_lines = cached_splitlines(source, strict=True)
+    boundary_lineno = _ast_leading_boundary_lineno(source, node)
+    return source_lines[boundary_lineno : node.lineno - 1]
+
+
+def _ast_leading_boundary_lineno(source: str, node: ast.AST) -> int:
+    """
+    Return the line number of the last line above the node that is not part of its
+    leading comments and decorator list, or 0 if there is no such line
+    """
+
+    # WARNING: ast.AST.lineno and ast.AST.end_lineno are 1-indexed
+
     # Use strict_splitlines() instead of str.splitlines(), because CPython's ast.parse()
     # doesn't parse the source string "#\x0c0" as containing an expression.
-    above_lines = cached_splitlines(source, strict=True)[: node.lineno - 1]
+    source_lines = cached_splitlines(source, strict=True)
 
     decorator_list_linenos: set[int] = set()
     for decorator in getattr(node, "decorator_list", []):
         lineno, end_lineno = decorator.lineno, decorator.end_lineno
         decorator_list_linenos.update(range(lineno, end_lineno + 1))
 
+    # Walk backwards from the line right above the node, instead of materializing all
+    # the lines above the node, which would be quadratic over the declarations.
     boundary_lineno = 0  # 0 is a virtual line
-    for lineno, line in ireverse(zip(range(1, node.lineno), above_lines)):
+    for lineno in range(node.lineno - 1, 0, -1):
+        line = source_lines[lineno - 1]
         if not (
             is_blank_line(line)
             or is_comment_line(line)
@@ -114,9 +130,7 @@ def ast_get_leading_comment_and_decorator_list_source_lines(
             boundary_lineno = lineno
             break
 
-    leading_source_lines = above_lines[boundary_lineno : node.lineno - 1]
-
-    return leading_source_lines
+    return boundary_lineno
 
 
 def ast_get_leading_comment_source_lines(source: str, node: ast.AST) -> list[str]:
@@ -124,7 +138,7 @@ def ast_get_leading_comment_source_lines(source: str, node: ast.AST) -> list[str
 
     # Use strict_splitlines() instead of str.splitlines(), because CPython's ast.parse()
     # doesn't parse the source string "#\x0c0" as containing an expression.
-    above_lines = cached_splitlines(source, strict=True)[: node.lineno - 1]
+    source_lines = cached_splitlines(source, strict=True)
 
     decorator_list_linenos: set[int] = set()
     for decorator in getattr(node, "decorator_list", []):
@@ -132,7 +146,8 @@ def ast_get_leading_comment_source_lines(source: str, node: ast.AST) -> list[str
         decorator_list_linenos.update(range(lineno, end_lineno + 1))
 
     leading_comment_lines: list[str] = []
-    for lineno, line in ireverse(zip(range(1, node.lineno), above_lines)):
+    for lineno in range(node.lineno - 1, 0, -1):
+        line = source_lines[lineno - 1]
         if lineno in decorator_list_linenos:
             continue
         elif is_blank_line(line) or is_comment_line(line):
@@ -185,11 +200,18 @@ def ast_get_source(source: str, node: ast.AST) -> str:
 
     # TODO compared with ast.source_segment() ?
 
-    lines = ast_get_leading_comment_and_decorator_list_source_lines(
-        source, node
-    ) + ast_get_source_lines(source, node)
+    # The leading lines and the lines of the node are contiguous. So instead of joining
+    # the individual lines, slice the source by the line offsets, which are computed
+    # once per source.
+    assert isinstance(node, (ast.stmt, ast.expr)), "node has no location information"
+
+    line_offsets = cached_line_offsets(source)
+    start = line_offsets[_ast_leading_boundary_lineno(source, node)]
+    end = line_offsets[node.end_lineno]
+    segment = source[start:end]
+
     # FIXME on the case that the file doesn't have an EOF final newline
-    return "\n".join(lines) + "\n"
+    return segment if segment.endswith("\n") else segment + "\n"
 
 
 # XXX Is cached_ast_iter_child_nodes usable across the whole source repository?
@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import hashlib
+import os
+from pathlib import Path
+
+
+__all__ = ["cache_key", "load", "store", "shrink"]
+
+
+# A persistent cache of sorting results. Each result is stored as a file named by its
+# key, which is derived from the SHA-256 digest of the source, and the fingerprint of the
+# options that the source is sorted with.
+#
+# A source left unchanged by sorting is stored as an empty file, to save space. It's not
+# ambiguous, because a sorted source always ends with a newline, hence is never empty.
+#
+# The cache is merely an optimization. Failures to access it, e.g. because the cache
+# directory is not writable, are deemed cache misses, instead of failing the run.
+
+
+# Account for the filesystem overhead of each entry, so that the entries of unchanged
+# sources, which are empty files, are bounded as well.
+ENTRY_OVERHEAD = 4096  # unit is byte
+# Specify the name of the file recording the estimated size of the cache. Entries are
+# named by hexadecimal digests, so there is no clash.
+SIZE_FILENAME = "size"
+
+
+def cache_key(source_digest: bytes, fingerprint: str) -> str:
+    """Derive the cache key from the digest of the source and the options fingerprint"""
+    return hashlib.sha256(fingerprint.encode() + source_digest).hexdigest()
+
+
+def load(cache_dir: Path, key: str) -> str | None:
+    """
+    Return the cached result, or None on cache miss
+
+    An empty string means the source is left unchanged.
+    """
+
+    try:
+        return (cache_dir / key).read_bytes().decode("utf-8")
+    except (OSError, UnicodeDecodeError):
+        return None
+
+
+def store(cache_dir: Path, key: str, new_source: str | None) -> int:
+    """
+    Store the result, where None means the source is left unchanged
+
+    Return the size accounted for the stored entry, or 0 if it fails to be stored.
+    """
+
+    # Write to a temporary file and then atomically replace, so that concurrent runs
+    # never load a half-written entry.
+    tmp_file = cache_dir / f"{key}.{os.getpid()}.tmp"
+    data = (new_source or "").encode("utf-8")
+
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp_file.write_bytes(data)
+        os.replace(tmp_file, cache_dir / key)
+    except OSError:
+        try:
+            tmp_file.unlink()
+        except OSError:
+            pass
+        return 0
+
+    return len(data) + ENTRY_OVERHEAD
+
+
+def shrink(cache_dir: Path, max_size: int, stored_size: int) -> None:
+    """
+    Evict the least recently stored entries, if the cache size is over threshold
+
+    `stored_size` is the total size of the entries stored since the last call. The cache
+    directory is only walked when the recorded size plus `stored_size` is over
+    threshold, or when no size is recorded yet.
+    """
+
+    size_file = cache_dir / SIZE_FILENAME
+
+    try:
+        estimated_size = int(size_file.read_text(encoding="utf-8")) + stored_size
+    except (OSError, ValueError):
+        estimated_size = None
+
+    # The estimate errs on the high side when an existing entry is overwritten, which
+    # only causes a walk. Concurrent runs may lose each other's updates, which the next
+    # walk corrects.
+    if estimated_size is not None and estimated_size <= max_size:
+        record_size(size_file, estimated_size)
+        return
+
+    try:
+        with os.scandir(cache_dir) as it:
+            entries = [
+                (stat.st_mtime_ns, stat.st_size + ENTRY_OVERHEAD, entry.path)
+                for entry in it
+                if entry.name != SIZE_FILENAME
+                and entry.is_file()
+                and (stat := entry.stat())
+            ]
+    except OSError:
+        return
+
+    size = sum(entry_size for _, entry_size, _ in entries)
+
+    if size > max_size:
+        entries.sort()
+        for _, entry_size, path in entries:
+            if size <= max_size:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                # E.g. already evicted by a concurrent run
+                pass
+            size -= entry_size
+
+    record_size(size_file, size)
+
+
+def record_size(size_file: Path, size: int) -> None:
+    """Record the estimated size of the cache, on a best-effort basis"""
+
+    try:
+        size_file.write_text(str(size), encoding="utf-8")
+    except OSError:
+        pass
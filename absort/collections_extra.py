@@ -169,7 +169,7 @@ class OrderedBox(Generic[T]):
             return self._item > other._item
 
 
-@dataclass(order=True)
+@dataclass(order=True, slots=True)
 class PrioritizedItem(Generic[T]):
     priority: Comparable
     item: T = field(compare=False)
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import operator
 import sys
 from collections.abc import Iterable, Iterator, Sequence as Seq
 from enum import Enum, auto
@@ -9,7 +10,7 @@ from string import whitespace
 from typing import cast
 
 import attrs
-from more_itertools import flatten, one
+from more_itertools import flatten
 from recipes.misc import profile
 from typing_extensions import assert_never
 
@@ -20,7 +21,8 @@ from .collections_extra import OrderedSet
 from .directed_graph import DirectedGraph as DGraph
 from .neoast import Declaration
 from .typing_extra import PyVersion
-from .utils import char_diff, duplicated, ireverse, strict_splitlines
+from .utils import cached_line_offsets, char_diff, duplicated
+from .visitors import GetUndefinedVariableVisitor
 from .weighted_graph import WeightedGraph as WGraph
 
 
@@ -87,11 +89,12 @@ def absort_str(
     """ Sort the source code in string """
     # TODO detail docstring. Specify exceptions raised under respective condition.
 
-    def preliminary_sanity_check(top_level_stmts: list[ast.stmt]) -> None:
+    def preliminary_sanity_check(
+        blocks: list[tuple[int, int, list[Declaration]]]
+    ) -> None:
         # TODO add more sanity checks
 
-        decls = [stmt for stmt in top_level_stmts if isinstance(stmt, Declaration)]
-        decl_names = [decl.name for decl in decls]
+        decl_names = [decl.name for _, _, decls in blocks for decl in decls]
 
         if duplicated(decl_names):
             raise NameRedefinition("Name redefinition exists. Not supported yet.")
@@ -105,27 +108,50 @@ def absort_str(
 
     top_level_stmts = module_tree.body
 
-    preliminary_sanity_check(top_level_stmts)
+    # The declarations are collected into blocks in a single pass over the top level
+    # statements, and the sanity check goes over the blocks, instead of filtering the
+    # statements once more.
+    blocks = list(find_continguous_decls(top_level_stmts))
 
-    blocks = find_continguous_decls(top_level_stmts)
+    preliminary_sanity_check(blocks)
 
-    # Use strict_splitlines() instead of str.splitlines(), because CPython's ast.parse()
-    # doesn't parse the source string "#\x0c0" as containing an expression.
+    # Only '\n' is deemed line boundary, as strict_splitlines() does, instead of the
+    # universal newlines of str.splitlines(), because CPython's ast.parse() doesn't
+    # parse the source string "#\x0c0" as containing an expression.
     # TODO is't a bug of CPython? What's the behavior of PyPy? Open an issue?
-    new_source_lines = strict_splitlines(old_source, keepends=True)
+    line_offsets = cached_line_offsets(old_source)
 
-    # FIXME below lines are actually unnecessary at all
+    # Copy the spans between the blocks from the old source by offsets, and splice in the
+    # sorted blocks, in a single pass.
+    new_source_parts: list[str] = []
+    copied_offset = 0
 
-    offset = 0
     for lineno, end_lineno, decls in blocks:
         sorted_decls = absort_decls(decls, py_version, format_option, sort_order)
+
+        # Without the aggressive transformations, the original layout is retained. So
+        # a block that is already sorted can be left as is, instead of being reassembled
+        # from the sources of its declarations.
+        if not format_option.aggressive and all(map(operator.is_, sorted_decls, decls)):
+            continue
+
         related_source = get_related_source_of_block(
             old_source, sorted_decls, format_option
         )
-        new_source_lines[lineno - 1 + offset : end_lineno + offset] = [related_source]
-        offset -= end_lineno - lineno
-
-    new_source = "".join(new_source_lines)
+        new_source_parts.append(old_source[copied_offset : line_offsets[lineno - 1]])
+        new_source_parts.append(related_source)
+        copied_offset = line_offsets[end_lineno]
+
+    # If none of the blocks is rewritten, the old source is retained, and the only
+    # changes come from the whitespace normalization below. So the reassembly and the
+    # sanity check are skipped.
+    changed = bool(new_source_parts)
+
+    if changed:
+        new_source_parts.append(old_source[copied_offset:])
+        new_source = "".join(new_source_parts)
+    else:
+        new_source = old_source
 
     # This line is a heuristic. It's visually bad to have blank lines at the
     # start and end of the document. So we explicitly remove them.
@@ -134,7 +160,8 @@ def absort_str(
     # Insert a final newline for POSIX compliant style.
     new_source = new_source + "\n"
 
-    post_sanity_check(old_source, new_source)
+    if changed:
+        post_sanity_check(old_source, new_source)
 
     return new_source
 
@@ -201,12 +228,24 @@ def absort_decls(
             return sort_decls_by_syntax_tree_similarity(same_level_decls)
 
         else:
-            orders = {decl: idx for idx, decl in enumerate(decls)}
-            return iter(sorted(same_level_decls, key=orders.__getitem__))
+            return iter(
+                sorted(same_level_decls, key=lambda decl: decl_orders[decl.name])
+            )
 
     decls = list(decls)
 
-    if duplicated(decl.name for decl in decls):
+    # A lone declaration is trivially sorted. It's common in blocks between other
+    # statements, so spare it the dependency graph and the sorting machinery.
+    if len(decls) <= 1:
+        return decls
+
+    # The index is shared by all the calls of same_abstract_level_sorter(), instead of
+    # being rebuilt for every abstract level. It's keyed by names, which are cheap to
+    # hash, unlike the declarations themselves, whose hash is structural.
+    decl_orders = {decl.name: idx for idx, decl in enumerate(decls)}
+
+    # Name redefinitions collapse in the index, so it doubles as the duplication check
+    if len(decl_orders) < len(decls):
         raise NameRedefinition("Name redefinition exists. Not supported yet.")
 
     # TODO Use DGraph[Declaration] instead of DGraph[str]
@@ -215,7 +254,10 @@ def absort_decls(
     # TODO Refactor
 
     if sort_order is SortOrder.TOPOLOGICAL:
-        sccs = ireverse(graph.strongly_connected_components())
+        # Tarjan's algorithm yields the SCCs in reverse topological order. Reverse them in
+        # place, instead of through a generator that indexes the materialized list.
+        sccs = list(graph.strongly_connected_components())
+        sccs.reverse()
         sorted_decls = list(flatten(same_abstract_level_sorter(scc) for scc in sccs))
 
     elif sort_order in (SortOrder.DEPTH_FIRST, SortOrder.BREADTH_FIRST):
@@ -256,13 +298,18 @@ def absort_decls(
     if format_option.reverse:
         sorted_decls.reverse()
 
-    if format_option.pin_main:
-        main_decl = one(decl for decl in sorted_decls if decl.name == "main")
-        sorted_decls.remove(main_decl)
-        sorted_decls.append(main_decl)
+    if format_option.pin_main and "main" in decl_orders:
+        # Locate the main function by name and move it by index. list.remove() would
+        # instead compare the declarations structurally, one by one.
+        main_idx = next(
+            idx for idx, decl in enumerate(sorted_decls) if decl.name == "main"
+        )
+        sorted_decls.append(sorted_decls.pop(main_idx))
 
-    # Sanity check
-    assert len(sorted_decls) == len(decls) and set(sorted_decls) == set(decls)
+    # Sanity check. Compare by identity, as the declarations are hashed and compared
+    # structurally, which is costly, and less strict.
+    assert len(sorted_decls) == len(decls)
+    assert set(map(id, sorted_decls)) == set(map(id, decls))
 
     return sorted_decls
 
@@ -304,14 +351,12 @@ def generate_dependency_graph(
 
     # TODO return DGraph[Declaration] instead of DGraph[str]
 
-    assert not duplicated(decl.name for decl in decls)
-
     index = {decl.name: decl for decl in decls}
+    assert len(index) == len(decls), "Name redefinition exists"
 
     graph = DGraph[Declaration]()
 
-    for decl in decls:
-        deps = get_dependency_of_decl(decl, py_version)
+    for decl, deps in zip(decls, get_dependencies_of_decls(decls, py_version)):
         for dep in deps:
 
             # We don't add the dependency to the dependency graph, when:
@@ -330,9 +375,20 @@ def generate_dependency_graph(
     return graph
 
 
-def get_dependency_of_decl(decl: Declaration, py_version: PyVersion) -> set[str]:
-    """ Calculate the dependencies (as set of symbols) of the declaration """
-    return decl.free_symbols(py_version)
+def get_dependencies_of_decls(
+    decls: Seq[Declaration], py_version: PyVersion
+) -> Iterator[set[str]]:
+    """
+    Calculate the dependencies (as sets of symbols) of the declarations, among the
+    declarations themselves
+    """
+
+    # Reuse a single visitor across the declarations, instead of instantiating one per
+    # declaration. Names other than the declarations', e.g. imports and builtins, are
+    # dropped by the visitor right away, instead of being collected and filtered later.
+    decl_names = frozenset(decl.name for decl in decls)
+    visitor = GetUndefinedVariableVisitor(py_version, decl_names)
+    return visitor.visit_each(decls)
 
 
 def get_related_source_of_block(
@@ -342,13 +398,15 @@ def get_related_source_of_block(
 ) -> str:
     """ Retrieve source corresponding to the block of continguous declarations, from source """
 
-    related_source = ""
+    related_source_parts: list[str] = []
+
+    aggressive = format_option.aggressive
 
     for decl in decls:
 
         decl_source = decl.source(source)
 
-        if format_option.aggressive:
+        if aggressive:
 
             if not decl_source.strip():
 
@@ -373,6 +431,6 @@ def get_related_source_of_block(
                 # declarations is conformant to the PEP-8 style (https://pep8.org/#blank-lines).
                 decl_source = "\n\n" + decl_source
 
-        related_source += decl_source
+        related_source_parts.append(decl_source)
 
-    return related_source
+    return "".join(related_source_parts)
@@ -245,6 +245,23 @@ class DirectedGraph(Generic[Node]):
 
         return new_graph
 
+    def _number_nodes(self) -> tuple[list[Node], list[list[int]]]:
+        """
+        Number the nodes by their insertion order, and return the nodes along with the
+        adjacency list in terms of the numbers.
+
+        Graph algorithms do their bookkeeping on lists indexed by the numbers, instead of
+        hashing the nodes over and over again.
+        """
+
+        nodes = list(self._adjacency_list)
+        node_ids = {node: i for i, node in enumerate(nodes)}
+        successors = [
+            [node_ids[child] for child in children]
+            for children in self._adjacency_list.values()
+        ]
+        return nodes, successors
+
     def topological_sort(
         self,
         reverse: bool = False,
@@ -265,21 +282,23 @@ class DirectedGraph(Generic[Node]):
             yield from self.get_transpose_graph().topological_sort()
             return
 
-        indegree_table = defaultdict(int)
-        for children in self._adjacency_list.values():
+        nodes, successors = self._number_nodes()
+
+        indegree_table = [0] * len(nodes)
+        for children in successors:
             for child in children:
                 indegree_table[child] += 1
 
         cnt = 0
-        sources = [node for node in self._adjacency_list if indegree_table[node] == 0]
+        sources = [node for node in range(len(nodes)) if indegree_table[node] == 0]
 
         while sources:
             cnt += len(sources)
-            yield from same_rank_sorter(sources)
+            yield from same_rank_sorter([nodes[node] for node in sources])
 
-            new_sources = []  # type: list[Node]
+            new_sources: list[int] = []
             for node in sources:
-                for child in self._adjacency_list[node]:
+                for child in successors[node]:
                     indegree_table[child] -= 1
 
                     if indegree_table[child] == 0:
@@ -287,7 +306,7 @@ class DirectedGraph(Generic[Node]):
 
             sources = new_sources
 
-        if cnt < len(self._adjacency_list):
+        if cnt < len(nodes):
             raise CircularDependencyError(
                 "Circular dependency detected! "
                 + "Try to run the method detect_cycle() to find cycle, "
@@ -310,35 +329,59 @@ class DirectedGraph(Generic[Node]):
         This method traverses all the nodes regardless of the connectivity of the graph.
         """
 
-        @profile
-        def rec_scc(node: Node) -> Iterator[SCC[Node]]:
-            nonlocal count, stack
+        # Tarjan's algorithm is implemented iteratively, with an explicit stack of the
+        # nodes being explored, to not be bounded by the recursion limit on deep graphs.
+
+        nodes, successors = self._number_nodes()
 
-            indexer[node] = count
-            lowlinks[node] = count
+        UNVISITED = -1
+        indexer = [UNVISITED] * len(nodes)
+        lowlinks = [0] * len(nodes)
+        stack_positions = [UNVISITED] * len(nodes)
+
+        count = 0
+        stack: list[int] = []
+
+        def visit(node: int) -> None:
+            nonlocal count
+            indexer[node] = lowlinks[node] = count
             count += 1
+            stack_positions[node] = len(stack)
             stack.append(node)
 
-            for child in self._adjacency_list[node]:
-                if child not in indexer:
-                    yield from rec_scc(child)
-                    lowlinks[node] = min(lowlinks[node], lowlinks[child])
+        for root in range(len(nodes)):
+            if indexer[root] != UNVISITED:
+                continue
+
+            visit(root)
+            call_stack = [(root, iter(successors[root]))]
 
-                elif child in stack:
-                    lowlinks[node] = min(lowlinks[node], indexer[child])
+            while call_stack:
+                node, children = call_stack[-1]
 
-            if lowlinks[node] == indexer[node]:
-                stack, scc = stack[: stack.index(node)], stack[stack.index(node) :]
-                yield scc
+                for child in children:
+                    if indexer[child] == UNVISITED:
+                        visit(child)
+                        call_stack.append((child, iter(successors[child])))
+                        break
 
-        count = 0
-        stack: list[Node] = []
-        indexer: dict[Node, int] = {}
-        lowlinks: dict[Node, int] = {}
+                    elif stack_positions[child] != UNVISITED:
+                        lowlinks[node] = min(lowlinks[node], indexer[child])
 
-        for node in self._adjacency_list:
-            if node not in indexer:
-                yield from rec_scc(node)
+                else:
+                    call_stack.pop()
+
+                    if call_stack:
+                        parent = call_stack[-1][0]
+                        lowlinks[parent] = min(lowlinks[parent], lowlinks[node])
+
+                    if lowlinks[node] == indexer[node]:
+                        position = stack_positions[node]
+                        scc = stack[position:]
+                        del stack[position:]
+                        for member in scc:
+                            stack_positions[member] = UNVISITED
+                        yield [nodes[member] for member in scc]
 
     def __str__(self) -> str:
         return "Graph({})".format(dict(self._adjacency_list))
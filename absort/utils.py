@@ -1,5 +1,4 @@
 import contextlib
-import difflib
 import functools
 import math
 import operator
@@ -7,7 +6,6 @@ import os
 import sys
 from collections import Counter, OrderedDict
 from collections.abc import Callable, Collection, Hashable, Iterable, Iterator
-from decimal import Decimal
 from functools import cache
 from itertools import combinations, zip_longest
 from numbers import Complex, Number
@@ -24,6 +22,7 @@ __all__ = [
     "xreverse",
     "colorized_unified_diff",
     "cached_splitlines",
+    "cached_line_offsets",
     "silent_context",
     "Logger",
     "is_blank_line",
@@ -75,6 +74,9 @@ def colorized_unified_diff(
 ) -> Iterator[str]:
     """ Return unified diff view between a and b, with color """
 
+    # Lazy import, difflib is only needed when displaying diff
+    import difflib
+
     # for line in difflib.ndiff(a, b, *args, **kwargs):
     # for line in difflib.context_diff(a, b, *args, **kwargs):
     for line in difflib.unified_diff(a, b, *args, **kwargs):
@@ -294,6 +296,8 @@ class on_except_return:
         self._exception = exception
         self._return = returns
 
+    __slots__ = ("_exception", "_return")
+
     def __call__(self, func: Callable) -> Callable:
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
@@ -382,7 +386,9 @@ def memoization(
     return decorator  # type: ignore
 
 
-@cache
+# The line caches are only ever queried on the source being sorted. Bound them, so that
+# the sources of the files already processed are not retained for the whole run.
+@functools.lru_cache(maxsize=8)
 def cached_splitlines(s: str, strict: bool = False) -> list[str]:
     """
     A cached version of the `splitlines` method
@@ -399,6 +405,28 @@ def cached_splitlines(s: str, strict: bool = False) -> list[str]:
         return s.splitlines()
 
 
+@functools.lru_cache(maxsize=8)
+def cached_line_offsets(s: str) -> list[int]:
+    """
+    Return the offsets where the lines start, followed by the length of the string
+
+    Only '\n' line feed character is deemed line boundary, consistent with strict_splitlines().
+    So the i-th line (0-indexed) of strict_splitlines(s, keepends=True) is
+    `s[offsets[i] : offsets[i + 1]]`.
+    """
+
+    offsets = [0]
+    index = s.find("\n")
+    while index != -1:
+        offsets.append(index + 1)
+        index = s.find("\n", index + 1)
+
+    if s and not s.endswith("\n"):
+        offsets.append(len(s))
+
+    return offsets
+
+
 @contextlib.contextmanager
 def no_color_context() -> Iterator[None]:
     """
@@ -425,6 +453,9 @@ def is_nan(x: Any) -> bool:
 
     # Alternative implementation is `is_nan = lambda x: x != x`
 
+    # Lazy import, to not pay the import cost of decimal at startup
+    from decimal import Decimal
+
     if isinstance(x, Decimal):
         return x.is_nan()
     elif isinstance(x, Complex):
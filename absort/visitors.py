@@ -1,9 +1,11 @@
 import ast
-from collections.abc import Sequence as Seq
+from collections.abc import Callable, Iterable, Iterator, Sequence as Seq, Set
+from typing import Any
 
 from recipes.exceptions import Unreachable
 from typing_extensions import assert_never
 
+from .astutils import AST_NODE_CLASS_FIELDS_TABLE, Terminals
 from .typing_extra import PyVersion
 
 
@@ -39,6 +41,46 @@ class BogusNode(ast.AST):
     pass
 
 
+# Kinds of the fields of ast nodes, as classified by classify_child_fields()
+NODE_FIELD = 1
+NODE_LIST_FIELD = 2
+UNKNOWN_FIELD = 3
+
+_child_fields_table: dict[type[ast.AST], tuple[tuple[str, int], ...]] = {}
+
+
+def classify_child_fields(node_class: type[ast.AST]) -> tuple[tuple[str, int], ...]:
+    """
+    Classify the fields of the ast node class that can hold child nodes, by whether they
+    hold a node, a list of nodes, or it's unknown beforehand. The result is cached per
+    node class.
+    """
+
+    try:
+        return _child_fields_table[node_class]
+    except KeyError:
+        pass
+
+    table_fields = AST_NODE_CLASS_FIELDS_TABLE.get(node_class.__name__)
+
+    # The table is built against some specific Python version. Only trust it when it
+    # agrees with the running interpreter.
+    if table_fields is None or tuple(name for _, name in table_fields) != getattr(
+        node_class, "_fields", ()
+    ):
+        fields = tuple((name, UNKNOWN_FIELD) for name in node_class._fields)
+
+    else:
+        fields = tuple(
+            (name, NODE_LIST_FIELD if field_type[-1] == "*" else NODE_FIELD)
+            for field_type, name in table_fields
+            if field_type.rstrip("?*") not in Terminals
+        )
+
+    _child_fields_table[node_class] = fields
+    return fields
+
+
 # TODO fill in docstring to elaborate on details
 # Class methods are ordered by their appearance order in https://docs.python.org/3/library/ast.html#abstract-grammar
 class GetUndefinedVariableVisitor(ast.NodeVisitor):
@@ -51,14 +93,21 @@ class GetUndefinedVariableVisitor(ast.NodeVisitor):
     ```
     """
 
-    def __init__(self, py_version: PyVersion) -> None:
+    def __init__(
+        self, py_version: PyVersion, interesting_names: Set[str] | None = None
+    ) -> None:
+        """
+        If interesting_names is given, only undefined variables among them are collected.
+        Other names are skipped without being looked up in the namespaces.
+        """
+
         super().__init__()
 
         self._undefined_vars: set[str] = set()
         self._namespaces: list[dict[str, ast.AST]] = []
         self._py_version: PyVersion = py_version
-
-    __slots__ = ("_undefined_vars", "_namespaces", "_py_version")
+        self._interesting_names: Set[str] | None = interesting_names
+        self._dispatch_table: dict[type[ast.AST], Callable[[Any], None]] = {}
 
     def _symbol_lookup(self, name: str) -> ast.AST | None:
         for namespace in reversed(self._namespaces):
@@ -67,9 +116,68 @@ class GetUndefinedVariableVisitor(ast.NodeVisitor):
         return None
 
     def visit(self, node: ast.AST) -> set[str]:
-        super().visit(node)
+        # Cache the bound visitor method per node class. ast.NodeVisitor.visit() instead
+        # formats the method name and looks it up on every node. The cache survives
+        # reset(), so it's shared across all the statements visited by visit_each().
+        node_class = type(node)
+        try:
+            visitor = self._dispatch_table[node_class]
+        except KeyError:
+            visitor = getattr(self, "visit_" + node_class.__name__, self.generic_visit)
+            self._dispatch_table[node_class] = visitor
+
+        visitor(node)
         return self._undefined_vars
 
+    def generic_visit(self, node: ast.AST) -> None:
+        # Same as ast.NodeVisitor.generic_visit(), except that the fields are classified
+        # beforehand, so that terminal fields are skipped and node fields are visited
+        # without testing their value types.
+
+        visit = self.visit
+
+        for name, kind in classify_child_fields(type(node)):
+            value: Any = getattr(node, name, None)
+
+            if kind == NODE_FIELD:
+                if value is not None:
+                    visit(value)
+
+            elif kind == NODE_LIST_FIELD:
+                # None may show up in lists, e.g. the keys of dict unpacking
+                for child in value:
+                    if child is not None:
+                        visit(child)
+
+            elif isinstance(value, ast.AST):
+                visit(value)
+
+            elif isinstance(value, list):
+                for child in value:
+                    if isinstance(child, ast.AST):
+                        visit(child)
+
+    def reset(self) -> None:
+        """
+        Reset the internal states, so that the visitor can be reused
+        """
+
+        self._undefined_vars = set()
+        self._namespaces = []
+
+    def visit_each(self, nodes: Iterable[ast.stmt]) -> Iterator[set[str]]:
+        """
+        Yield the undefined variables of each statement, as if the statement is the sole
+        statement of a module. The same visitor is reused across the statements.
+        """
+
+        for node in nodes:
+            self.reset()
+            # Set up the module namespace as visit_Module() would do, instead of wrapping
+            # each statement in a throwaway ast.Module.
+            self._namespaces.append({})
+            yield self.visit(node)
+
     def _visit(self, obj: ast.AST | Seq[ast.AST] | None) -> None:
         """
         A handy helper method that can accept either an ast node, or None, or a list of ast nodes.
@@ -192,7 +300,9 @@ class GetUndefinedVariableVisitor(ast.NodeVisitor):
 
     def visit_Name(self, node: ast.Name) -> None:
         if isinstance(node.ctx, ast.Load):
-            if not self._symbol_lookup(node.id):
+            if (
+                self._interesting_names is None or node.id in self._interesting_names
+            ) and not self._symbol_lookup(node.id):
                 self._undefined_vars.add(node.id)
 
         elif isinstance(node.ctx, ast.Store):
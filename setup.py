@@ -1,3 +1,5 @@
+import os
+
 import setuptools
 
 from absort import __version__
@@ -5,6 +7,17 @@ from absort import __version__
 with open("README.md", "r", encoding="utf-8") as fh:
     long_description = fh.read()
 
+# Optionally compile the AST visitor, the hottest code path, to a C extension with mypyc.
+# It's opt-in, and falls back to the pure-Python module if mypyc is not available.
+ext_modules = []
+if os.environ.get("ABSORT_USE_MYPYC") == "1":
+    try:
+        from mypyc.build import mypycify
+    except ImportError:
+        print("mypyc is not available, fall back to the pure-Python build")
+    else:
+        ext_modules = mypycify(["--config-file", "mypyc.ini", "absort/visitors.py"])
+
 setuptools.setup(
     name="ABSort",
     author="MapleCCC",
@@ -24,4 +37,5 @@ setuptools.setup(
     python_requires=">=3.10",
     install_requires=open("requirements/install.txt", "r").read().splitlines(),
     entry_points={"console_scripts": ["absort=absort.__main__:main"]},
+    ext_modules=ext_modules,
 )
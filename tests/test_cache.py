@@ -0,0 +1,65 @@
+import os
+from pathlib import Path
+
+import pytest
+from hypothesis import given
+from hypothesis.strategies import none, one_of, text
+
+from absort.cache import ENTRY_OVERHEAD, SIZE_FILENAME, cache_key, load, shrink, store
+
+
+KEY = cache_key(bytes(32), "fingerprint")
+
+
+def test_load_miss(tmp_path: Path) -> None:
+    assert load(tmp_path, KEY) is None
+
+
+@given(one_of(none(), text(min_size=1)))
+def test_store_load(
+    tmp_path_factory: pytest.TempPathFactory, new_source: str | None
+) -> None:
+    cache_dir = tmp_path_factory.mktemp("cache")
+    store(cache_dir, KEY, new_source)
+    assert load(cache_dir, KEY) == (new_source or "")
+
+
+def test_cache_key_depends_on_fingerprint() -> None:
+    assert cache_key(bytes(32), "a") != cache_key(bytes(32), "b")
+
+
+def test_shrink_evicts_oldest(tmp_path: Path) -> None:
+    for i in range(10):
+        assert store(tmp_path, str(i), "x" * 100) == 100 + ENTRY_OVERHEAD
+        # Ensure distinct modification times, in the storing order
+        os.utime(tmp_path / str(i), ns=(i * 10**9, i * 10**9))
+
+    shrink(tmp_path, 4 * (100 + ENTRY_OVERHEAD), 10 * (100 + ENTRY_OVERHEAD))
+
+    entries = sorted(p.name for p in tmp_path.iterdir() if p.name != SIZE_FILENAME)
+    assert entries == ["6", "7", "8", "9"]
+    assert (tmp_path / SIZE_FILENAME).read_text() == str(4 * (100 + ENTRY_OVERHEAD))
+
+
+def test_shrink_trusts_estimate_under_threshold(tmp_path: Path) -> None:
+    (tmp_path / SIZE_FILENAME).write_text("0")
+    for i in range(10):
+        store(tmp_path, str(i), "x" * 100)
+
+    # The recorded size plus the stored size is under threshold, so nothing is evicted,
+    # even though the entries actually on disk are over threshold
+    shrink(tmp_path, 100 + ENTRY_OVERHEAD, 100 + ENTRY_OVERHEAD)
+
+    assert len(list(tmp_path.iterdir())) == 11
+    assert (tmp_path / SIZE_FILENAME).read_text() == str(100 + ENTRY_OVERHEAD)
+
+
+def test_unwritable_cache_dir(tmp_path: Path) -> None:
+    not_a_directory = tmp_path / "file"
+    not_a_directory.touch()
+    cache_dir = not_a_directory / "cache"
+
+    assert store(cache_dir, KEY, "x") == 0
+    shrink(cache_dir, 0, 1)
+
+    assert load(cache_dir, KEY) is None
@@ -61,3 +61,42 @@ def test_strongly_connected_components(graph: DirectedGraph) -> None:
 
     assert len(scc_nodes) == len(nodes)
     assert set(scc_nodes) == set(nodes)
+
+
+def test_strongly_connected_components_example() -> None:
+    graph = DirectedGraph[str]()
+    edges = [("a", "b"), ("b", "c"), ("c", "a"), ("c", "d"), ("d", "e"), ("e", "d")]
+    for v, w in edges:
+        graph.add_edge(v, w)
+    graph.add_node("f")
+    graph.add_edge("g", "a")
+
+    sccs = list(graph.strongly_connected_components())
+
+    # In reverse topological order of the DAG formed by the SCCs
+    assert sccs == [["d", "e"], ["a", "b", "c"], ["f"], ["g"]]
+
+
+# Deeper than the default recursion limit
+DEEP_GRAPH_SIZE = 20000
+
+
+def test_strongly_connected_components_of_deep_chain() -> None:
+    graph = DirectedGraph[int]()
+    for node in range(DEEP_GRAPH_SIZE - 1):
+        graph.add_edge(node, node + 1)
+
+    sccs = list(graph.strongly_connected_components())
+
+    assert sccs == [[node] for node in reversed(range(DEEP_GRAPH_SIZE))]
+
+
+def test_strongly_connected_components_of_deep_cycle() -> None:
+    graph = DirectedGraph[int]()
+    for node in range(DEEP_GRAPH_SIZE):
+        graph.add_edge(node, (node + 1) % DEEP_GRAPH_SIZE)
+
+    sccs = list(graph.strongly_connected_components())
+
+    assert len(sccs) == 1
+    assert sorted(sccs[0]) == list(range(DEEP_GRAPH_SIZE))
@@ -12,7 +12,7 @@ from hypothesis.strategies import sampled_from
 from more_itertools import collapse
 
 from absort.__main__ import MutuallyExclusiveOptions, main as absort_entry
-from absort.ast_utils import ast_deep_equal
+from absort.astutils import ast_deep_equal
 from absort.utils import constantfunc, contains
 
 from .strategies import products
@@ -0,0 +1,150 @@
+import asyncio
+import inspect
+import re
+from pathlib import Path
+
+import pytest
+from hypothesis import given
+from hypothesis.strategies import from_regex
+
+import absort.__main__
+from absort.__main__ import (
+    FileResult,
+    load_sorted_index,
+    main as absort_entry,
+    parse_backup_timestamp,
+    run,
+    save_sorted_index,
+    shrink_cache,
+)
+
+
+@pytest.fixture
+def sorted_index_file(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    sorted_index_file = tmp_path / "sorted_index" / "sorted_index.json"
+    monkeypatch.setattr(absort.__main__, "SORTED_INDEX_FILE", sorted_index_file)
+    return sorted_index_file
+
+
+def test_sorted_index_roundtrip(sorted_index_file: Path) -> None:
+    sorted_index = {"/a.py": [1, 2], "/b.py": [3, 4]}
+    save_sorted_index(sorted_index, "fingerprint")
+    assert load_sorted_index("fingerprint") == sorted_index
+
+
+def test_sorted_index_of_other_options_is_discarded(sorted_index_file: Path) -> None:
+    save_sorted_index({"/a.py": [1, 2]}, "fingerprint")
+    assert load_sorted_index("other fingerprint") == {}
+
+
+def test_sorted_index_is_pruned(
+    sorted_index_file: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(absort.__main__, "SORTED_INDEX_MAX_ENTRIES", 2)
+    save_sorted_index({"/a.py": [1, 2], "/b.py": [3, 4], "/c.py": [5, 6]}, "fp")
+    assert load_sorted_index("fp") == {"/b.py": [3, 4], "/c.py": [5, 6]}
+
+
+def test_corrupted_sorted_index(sorted_index_file: Path) -> None:
+    sorted_index_file.parent.mkdir(parents=True)
+    sorted_index_file.write_text("[1, 2", encoding="utf-8")
+    assert load_sorted_index("fingerprint") == {}
+
+
+def test_save_sorted_index_to_unwritable_location(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    not_a_directory = tmp_path / "file"
+    not_a_directory.touch()
+    sorted_index_file = not_a_directory / "sorted_index" / "sorted_index.json"
+    monkeypatch.setattr(absort.__main__, "SORTED_INDEX_FILE", sorted_index_file)
+
+    save_sorted_index({"/a.py": [1, 2]}, "fingerprint")
+
+    assert load_sorted_index("fingerprint") == {}
+
+
+@pytest.mark.parametrize(
+    "filename, timestamp",
+    [
+        ("a.py.20201231235959.backup", "20201231235959"),
+        ("a.b.c.py.20201231235959.backup", "20201231235959"),
+        (".20201231235959.backup", "20201231235959"),
+    ],
+)
+def test_parse_backup_timestamp(filename: str, timestamp: str) -> None:
+    assert parse_backup_timestamp(filename) == timestamp
+
+
+@pytest.mark.parametrize(
+    "filename",
+    [
+        # Foreign files in the cache directory
+        "README",
+        "sorted_index",
+        "a.py",
+        ".backup",
+        # Malformed backup names
+        "a.py.backup",
+        "20201231235959.backup",
+        "a.py.2020123123595.backup",
+        "a.py.202012312359599.backup",
+        "a.py.2020123123595x.backup",
+        "a.py_20201231235959.backup",
+        "a.py.20201231235959.backup.tmp",
+        "a.py.20201231235959.Backup",
+    ],
+)
+def test_parse_backup_timestamp_of_non_backup_file(filename: str) -> None:
+    assert parse_backup_timestamp(filename) is None
+
+
+# The regex that parse_backup_timestamp() supersedes
+LEGACY_BACKUP_FILENAME_PATTERN = re.compile(r".*\.(?P<timestamp>\d{14})\.backup")
+
+
+@given(from_regex(r"[a-z.]{0,3}\.?[0-9x]{12,16}\.?(backup)?", fullmatch=True))
+def test_parse_backup_timestamp_agrees_with_legacy_regex(filename: str) -> None:
+    m = LEGACY_BACKUP_FILENAME_PATTERN.fullmatch(filename)
+    assert parse_backup_timestamp(filename) == (m.group("timestamp") if m else None)
+
+
+def test_shrink_cache_keeps_the_new_backup(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(absort.__main__, "CACHE_DIR", tmp_path)
+    monkeypatch.setattr(absort.__main__, "CACHE_MAX_SIZE", 10)
+    old_backup = tmp_path / "a.py.20200101000000.backup"
+    new_backup = tmp_path / "b.py.20200101000000.backup"
+    old_backup.write_bytes(b"x" * 8)
+    new_backup.write_bytes(b"x" * 16)
+
+    assert asyncio.run(shrink_cache(24, keep=new_backup)) == 16
+    assert not old_backup.exists()
+    assert new_backup.exists()
+
+
+def test_run_defaults_match_cli() -> None:
+    # Parse an empty command line, to retrieve the defaults of the CLI options
+    ctx = absort_entry.make_context("absort", [], resilient_parsing=True)
+    cli_defaults = {
+        name: value for name, value in ctx.params.items() if name != "filepaths"
+    }
+    run_params = inspect.signature(run).parameters
+
+    assert set(cli_defaults) == set(run_params) - {"filepaths"}
+    for name, default in cli_defaults.items():
+        assert run_params[name].default == default, name
+
+
+def test_run(tmp_path: Path) -> None:
+    test_file = tmp_path / "test.py"
+    test_file.write_text("def main(:\n    pass\n", encoding="utf-8")
+
+    digest = run([str(test_file)], check=True, quiet=True)
+
+    assert digest == {FileResult.FAILED: 1}
+
+
+def test_run_without_files(tmp_path: Path) -> None:
+    assert not run([str(tmp_path)], quiet=True)
@@ -12,9 +12,10 @@ from hypothesis.strategies import (
     lists,
     permutations,
     sampled_from,
+    text,
 )
 
-from absort.utils import iequal, strict_splitlines
+from absort.utils import cached_line_offsets, iequal, strict_splitlines
 from recipes.string import line_boundaries
 
 
@@ -41,6 +42,22 @@ def test_strict_splitlines_newline_only(s: str) -> None:
     assert strict_splitlines(s, keepends=True) == s.splitlines(keepends=True)
 
 
+@given(text())
+def test_cached_line_offsets(s: str) -> None:
+    offsets = cached_line_offsets(s)
+    lines = strict_splitlines(s, keepends=True)
+
+    # The line start offsets, followed by the length of the string as sentinel
+    assert len(offsets) == len(lines) + 1
+    assert offsets[0] == 0 and offsets[-1] == len(s)
+    for i, line in enumerate(lines):
+        assert s[offsets[i] : offsets[i + 1]] == line
+
+
+def test_cached_line_offsets_is_bounded() -> None:
+    assert cached_line_offsets.cache_info().maxsize == 8
+
+
 @composite
 def text_containing_universal_newlines(draw: DrawFn) -> str:
     a = draw(lists(characters()))
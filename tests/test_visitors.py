@@ -0,0 +1,73 @@
+import ast
+import inspect
+import sys
+from types import ModuleType
+
+import pytest
+
+from absort.visitors import GetUndefinedVariableVisitor
+
+
+PY_VERSION = sys.version_info[:2]
+
+SAMPLE_SOURCE = """\
+x = 1
+
+def f():
+    return x + g()
+
+def g():
+    y = 2
+    return [y for y in range(y)]
+
+class C(Base):
+    attr = f
+
+    def method(self):
+        return attr
+"""
+
+
+def sample_sources() -> list[str]:
+    modules: list[ModuleType] = [ast, inspect, pytest]
+    return [SAMPLE_SOURCE, *map(inspect.getsource, modules)]
+
+
+def undefined_variables_of_statement(stmt: ast.stmt) -> set[str]:
+    module = ast.Module(body=[stmt], type_ignores=[])
+    return GetUndefinedVariableVisitor(PY_VERSION).visit(module)
+
+
+@pytest.mark.parametrize("source", sample_sources())
+def test_visit_each_does_not_leak_state(source: str) -> None:
+    stmts = ast.parse(source).body
+    visitor = GetUndefinedVariableVisitor(PY_VERSION)
+
+    results = list(visitor.visit_each(stmts))
+
+    assert results == [undefined_variables_of_statement(stmt) for stmt in stmts]
+
+
+@pytest.mark.parametrize("source", sample_sources())
+def test_interesting_names(source: str) -> None:
+    stmts = ast.parse(source).body
+    interesting_names = frozenset(
+        stmt.name
+        for stmt in stmts
+        if isinstance(stmt, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef))
+    )
+
+    unfiltered = GetUndefinedVariableVisitor(PY_VERSION).visit_each(stmts)
+    filtered = GetUndefinedVariableVisitor(PY_VERSION, interesting_names).visit_each(
+        stmts
+    )
+
+    for unfiltered_vars, filtered_vars in zip(unfiltered, filtered, strict=True):
+        assert filtered_vars == unfiltered_vars & interesting_names
+
+
+def test_reset() -> None:
+    visitor = GetUndefinedVariableVisitor(PY_VERSION)
+    visitor.visit(ast.parse("a = b"))
+    visitor.reset()
+    assert visitor.visit(ast.parse("c = d")) == {"d"}